@@ -0,0 +1,90 @@
+import copy
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+
+from .cache import (STATS_FLUSH_EVERY, add_stats, bump_version,
+                    cache_is_shared, get_version)
+
+STATS_NAME = 'auth_tokens'
+
+
+def user_version_name(user_id):
+    return f'auth_user:{user_id}'
+
+
+def invalidate_user_tokens(user_id):
+    bump_version(user_version_name(user_id))
+
+
+class TokenCache:
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = Lock()
+        self._entries = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is not None:
+            user, token, version, expires = entry
+            if (expires > time.monotonic()
+                    and version == get_version(user_version_name(user.pk))):
+                self.count(hit=True)
+                return copy.copy(user), token
+            with self._lock:
+                self._entries.pop(key, None)
+        self.count(hit=False)
+        return None
+
+    def set(self, key, user, token):
+        version = get_version(user_version_name(user.pk))
+        with self._lock:
+            self._entries[key] = (
+                copy.copy(user), token, version,
+                time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def count(self, hit):
+        with self._lock:
+            if hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+            if self._hits + self._misses < STATS_FLUSH_EVERY:
+                return
+            hits, misses = self._hits, self._misses
+            self._hits = self._misses = 0
+        add_stats(STATS_NAME, hits, misses)
+
+
+token_cache = TokenCache(settings.AUTH_TOKEN_CACHE_SIZE,
+                         settings.AUTH_TOKEN_CACHE_TTL)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+
+    def authenticate_credentials(self, key):
+        if not cache_is_shared():
+            return super().authenticate_credentials(key)
+        cached = token_cache.get(key)
+        if cached is not None:
+            return cached
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, user, token)
+        return user, token
@@ -0,0 +1,153 @@
+import hashlib
+import time
+from threading import Lock
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+REFERENCE_CACHE_TIMEOUT = 60 * 60 * 24
+PROCESS_LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.dummy.DummyCache',
+    'django.core.cache.backends.locmem.LocMemCache',
+)
+STATS_FLUSH_EVERY = 100
+
+pending_stats = {}
+pending_stats_lock = Lock()
+
+
+def cache_is_shared():
+    return settings.CACHES['default']['BACKEND'] not in (
+        PROCESS_LOCAL_CACHE_BACKENDS)
+
+
+def version_key(name):
+    return f'version:{name}'
+
+
+def version_timeout():
+    if cache_is_shared():
+        return None
+    return settings.CACHE_VERSION_TTL
+
+
+def get_version(name):
+    return cache.get_or_set(version_key(name), time.time, version_timeout())
+
+
+def bump_version(name):
+    version = max(time.time(), cache.get(version_key(name), 0) + 1e-6)
+    cache.set(version_key(name), version, version_timeout())
+    return version
+
+
+def stats_key(name, result):
+    return f'stats:{name}:{result}'
+
+
+def record_stats(name, hit):
+    with pending_stats_lock:
+        counts = pending_stats.setdefault(name, [0, 0])
+        counts[0 if hit else 1] += 1
+        if sum(counts) < STATS_FLUSH_EVERY:
+            return
+        hits, misses = counts
+        del pending_stats[name]
+    add_stats(name, hits, misses)
+
+
+def add_stats(name, hits, misses):
+    for result, count in (('hits', hits), ('misses', misses)):
+        if not count:
+            continue
+        key = stats_key(name, result)
+        cache.add(key, 0, None)
+        try:
+            cache.incr(key, count)
+        except ValueError:
+            pass
+
+
+def get_stats(name):
+    hits = cache.get(stats_key(name, 'hits'), 0)
+    misses = cache.get(stats_key(name, 'misses'), 0)
+    return hits, misses
+
+
+class ProcessCache:
+    version_name = None
+
+    def __init__(self):
+        self._lock = Lock()
+        self._version = None
+        self._data = None
+
+    def load(self):
+        raise NotImplementedError
+
+    def get(self):
+        version = get_version(self.version_name)
+        with self._lock:
+            if self._version != version:
+                self._data = self.load()
+                self._version = version
+            return self._data
+
+    def invalidate(self):
+        bump_version(self.version_name)
+        with self._lock:
+            self._version = None
+
+
+class VersionedCacheMixin:
+    cache_version_name = None
+    cache_timeout = REFERENCE_CACHE_TIMEOUT
+
+    def use_cache(self, request):
+        return True
+
+    def get_etag(self, request, version):
+        query = urlencode(sorted(
+            (key, value)
+            for key, values in request.query_params.lists()
+            for value in values
+        ))
+        key = '|'.join((str(version), request.get_host(), request.path,
+                        query, request.accepted_renderer.media_type))
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if not self.use_cache(request):
+            return handler(request, *args, **kwargs)
+        version = get_version(self.cache_version_name)
+        etag = self.get_etag(request, version)
+        response = get_conditional_response(
+            request, etag=f'"{etag}"', last_modified=int(version))
+        if response is not None:
+            return response
+        key = f'response:{self.cache_version_name}:{etag}'
+        data = cache.get(key)
+        record_stats(self.cache_version_name, data is not None)
+        if data is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            cache.set(key, response.data, self.cache_timeout)
+            response['X-Cache'] = 'MISS'
+        else:
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+        response['ETag'] = f'"{etag}"'
+        response['Last-Modified'] = http_date(version)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs)
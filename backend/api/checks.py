@@ -0,0 +1,62 @@
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.checks import Error, Warning, register
+
+from .cache import cache_is_shared
+
+URLCONF_IMPORT_SCRIPT = '''
+from contextlib import ExitStack
+
+import django
+from django.conf import settings
+from django.db import connections
+
+django.setup()
+queries = []
+
+
+def record_query(execute, sql, params, many, context):
+    queries.append(sql)
+    raise RuntimeError('Запрос к БД при импорте URLConf')
+
+
+with ExitStack() as stack:
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(record_query))
+    try:
+        __import__(settings.ROOT_URLCONF)
+    except Exception:
+        pass
+print(len(queries))
+'''
+
+
+@register(deploy=True)
+def check_urlconf_import_queries(app_configs, **kwargs):
+    result = subprocess.run(
+        [sys.executable, '-c', URLCONF_IMPORT_SCRIPT],
+        capture_output=True, text=True, cwd=settings.BASE_DIR
+    )
+    if result.returncode != 0 or result.stdout.strip() != '0':
+        return [Error(
+            f'Импорт {settings.ROOT_URLCONF} обращается к базе данных.',
+            hint=(result.stderr or result.stdout).strip()[-500:],
+            id='api.E001',
+        )]
+    return []
+
+
+@register(deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    if cache_is_shared():
+        return []
+    return [Warning(
+        'Кэш по умолчанию хранится в памяти процесса: версии кэша, реестр '
+        'тегов, выход из аккаунта и привязка к основной базе не '
+        'передаются между воркерами.',
+        hint='Задайте CACHE_BACKEND=django_redis.cache.RedisCache и '
+             'CACHE_LOCATION=redis://<хост>:6379/1.',
+        id='api.W001',
+    )]
@@ -0,0 +1,27 @@
+from threading import local
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PRIMARY_ONLY_APPS = ('authtoken',)
+
+_state = local()
+
+
+def use_replica(enabled):
+    _state.replica = enabled
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if (getattr(_state, 'replica', False)
+                and model._meta.app_label not in PRIMARY_ONLY_APPS):
+            return settings.READ_REPLICA_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
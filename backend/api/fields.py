@@ -1,9 +1,20 @@
 import base64
+import binascii
+import tempfile
 
 # import webcolors
-from django.core.files.base import ContentFile
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from PIL import Image
 from rest_framework import serializers
 
+from recipes.renditions import rendition_names
+
+BASE64_MARKER = ';base64,'
+DECODE_CHUNK_SIZE = 4 * 64 * 1024
+SPOOL_MAX_SIZE = 1024 * 1024
+
 
 # class Hex2NameColor(serializers.Field):
 #     def to_representation(self, value):
@@ -18,9 +29,76 @@ from rest_framework import serializers
 
 
 class Base64ImageField(serializers.ImageField):
+    default_error_messages = {
+        'invalid_base64': 'Некорректные данные изображения в base64.',
+        'too_large': 'Размер изображения не должен превышать '
+                     '{max_size} байт.',
+        'too_many_pixels': 'Изображение не должно содержать больше '
+                           '{max_pixels} пикселей.',
+    }
+
+    def decode(self, data):
+        header_end = data.find(BASE64_MARKER)
+        if header_end == -1:
+            self.fail('invalid_base64')
+        start = header_end + len(BASE64_MARKER)
+        max_size = settings.RECIPE_IMAGE_MAX_SIZE
+        if (len(data) - start) // 4 * 3 > max_size:
+            self.fail('too_large', max_size=max_size)
+        file = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        for offset in range(start, len(data), DECODE_CHUNK_SIZE):
+            try:
+                file.write(base64.b64decode(
+                    data[offset:offset + DECODE_CHUNK_SIZE], validate=True))
+            except (binascii.Error, ValueError):
+                file.close()
+                self.fail('invalid_base64')
+        file.seek(0)
+        return File(file, name='temp')
+
+    def validate_image(self, file):
+        try:
+            image = Image.open(file)
+            width, height = image.size
+            image_format = image.format.lower()
+        except Exception:
+            self.fail('invalid_image')
+        max_pixels = settings.RECIPE_IMAGE_MAX_PIXELS
+        if width * height > max_pixels:
+            self.fail('too_many_pixels', max_pixels=max_pixels)
+        file.seek(0)
+        return image_format
+
     def to_internal_value(self, data):
-        if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
-        return super().to_internal_value(data)
+        is_base64 = isinstance(data, str) and data.startswith('data:image')
+        if is_base64:
+            data = self.decode(data)
+        file = serializers.FileField.to_internal_value(self, data)
+        max_size = settings.RECIPE_IMAGE_MAX_SIZE
+        if file.size > max_size:
+            self.fail('too_large', max_size=max_size)
+        image_format = self.validate_image(file)
+        if is_base64:
+            file.name = f'temp.{image_format}'
+        return file
+
+
+class ImageRenditionsField(serializers.Field):
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        if not recipe.image or not recipe.renditions_ready:
+            return {}
+        request = self.context.get('request')
+        renditions = rendition_names(recipe.image.name)
+        return {
+            width: {
+                extension: request.build_absolute_uri(
+                    default_storage.url(name))
+                for extension, name in names.items()
+            }
+            for width, names in renditions.items()
+        }
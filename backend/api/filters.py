@@ -1,17 +1,23 @@
 from django_filters.rest_framework import filters, FilterSet
 from rest_framework.filters import SearchFilter
 
-from recipes.models import Recipe, Tag
+from recipes.models import Recipe
+from .tag_registry import tag_choices
 
 
-class IngredientFilter(SearchFilter):
-    search_param = 'name'
+class RecipeSearchFilter(SearchFilter):
+
+    def filter_queryset(self, request, queryset, view):
+        search = request.query_params.get(self.search_param, '').strip()
+        if not search:
+            return queryset
+        return queryset.search(search)
 
 
 class RecipesFilters(FilterSet):
     tags = filters.MultipleChoiceFilter(
         field_name='tags__slug',
-        choices=[(tag.slug, tag.name) for tag in Tag.objects.all()]
+        choices=tag_choices
     )
     is_favorited = filters.BooleanFilter(
         method='filter_is_favorited'
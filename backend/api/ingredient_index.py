@@ -0,0 +1,37 @@
+from bisect import bisect_left
+
+from recipes.models import Ingredient
+from .cache import ProcessCache
+
+
+class IngredientIndex(ProcessCache):
+    version_name = 'ingredients'
+
+    @staticmethod
+    def normalize(value):
+        return value.casefold().replace('ё', 'е')
+
+    def load(self):
+        ingredients = Ingredient.objects.values_list(
+            'id', 'name', 'measurement_unit')
+        rows = sorted(
+            ((self.normalize(name), {
+                'id': id, 'name': name, 'measurement_unit': unit
+            }) for id, name, unit in ingredients.iterator()),
+            key=lambda row: (row[0], row[1]['id'])
+        )
+        return [key for key, _ in rows], [item for _, item in rows]
+
+    def search(self, query):
+        keys, items = self.get()
+        query = self.normalize(query)
+        start = bisect_left(keys, query)
+        end = bisect_left(keys, query + chr(0x10ffff), start)
+        contains = [
+            items[i] for i, key in enumerate(keys)
+            if query in key and not start <= i < end
+        ]
+        return items[start:end] + contains
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,307 @@
+import base64
+import io
+import json
+import random
+import statistics
+import tempfile
+import time
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag, TimelineEntry)
+from users.models import Subscription, User
+
+PASSWORD = 'bench_password'
+# Отдельный кэш, чтобы замеры не сбрасывали версии и ответы живого сервера.
+BENCHMARK_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmark',
+    }
+}
+PERCENTILES = (50, 95, 99)
+
+
+def recipe_payload(ctx):
+    return {
+        'tags': [ctx['tag']],
+        'ingredients': [{'id': pk, 'amount': 10}
+                        for pk in ctx['ingredients']],
+        'name': 'bench_new_recipe',
+        'text': 'bench',
+        'cooking_time': 10,
+        'image': ctx['image'],
+    }
+
+
+def user_payload(ctx):
+    return {
+        'email': f'bench_new_{ctx["n"]}@bench.ru',
+        'username': f'bench_new_{ctx["n"]}',
+        'first_name': 'bench',
+        'last_name': 'bench',
+        'password': PASSWORD,
+    }
+
+
+# (метод, url, клиент, тело запроса, ключ для сохранения id из ответа)
+ENDPOINTS = (
+    ('get', '/api/tags/', 'user', None, None),
+    ('get', '/api/tags/{tag}/', 'user', None, None),
+    ('get', '/api/ingredients/', 'user', None, None),
+    ('get', '/api/ingredients/?name={ingredient_prefix}', 'user', None,
+     None),
+    ('get', '/api/ingredients/{ingredient}/', 'user', None, None),
+    ('get', '/api/recipes/?limit=6', 'anon', None, None),
+    ('get', '/api/recipes/?limit=6', 'user', None, None),
+    ('get', '/api/recipes/?is_favorited=1&limit=6', 'user', None, None),
+    ('get', '/api/recipes/?is_in_shopping_cart=1&limit=6', 'user',
+     None, None),
+    ('get', '/api/recipes/?author={author}&limit=6', 'user', None, None),
+    ('get', '/api/recipes/?tags={tag_slug}&limit=6', 'user', None,
+     None),
+    ('get', '/api/recipes/?cursor=&limit=6', 'user', None, None),
+    ('get', '/api/recipes/?limit=6&fields=id,name,image,cooking_time',
+     'user', None, None),
+    ('get', '/api/recipes/{recipe}/', 'user', None, None),
+    ('get', '/api/recipes/feed/?limit=6', 'user', None, None),
+    ('get', '/api/recipes/feed/?limit=6&fields=id,name,image,cooking_time',
+     'user', None, None),
+    ('post', '/api/recipes/', 'user', recipe_payload, 'new_recipe'),
+    ('patch', '/api/recipes/{new_recipe}/', 'user', recipe_payload, None),
+    ('delete', '/api/recipes/{new_recipe}/', 'user', None, None),
+    ('post', '/api/recipes/{free_recipe}/favorite/', 'user', None, None),
+    ('delete', '/api/recipes/{free_recipe}/favorite/', 'user', None, None),
+    ('post', '/api/recipes/{free_recipe}/shopping_cart/', 'user', None,
+     None),
+    ('delete', '/api/recipes/{free_recipe}/shopping_cart/', 'user', None,
+     None),
+    ('get', '/api/recipes/favorites/?limit=6', 'user', None, None),
+    ('get', '/api/recipes/shopping_cart/?limit=6', 'user', None,
+     None),
+    ('get', '/api/recipes/download_shopping_cart/', 'user', None, None),
+    ('get', '/api/recipes/download_shopping_cart/?format=txt', 'user',
+     None, None),
+    ('get', '/api/recipes/download_shopping_cart/?format=csv', 'user',
+     None, None),
+    ('get', '/api/users/', 'user', None, None),
+    ('get', '/api/users/{author}/', 'user', None, None),
+    ('get', '/api/users/me/', 'user', None, None),
+    ('get', '/api/users/subscriptions/', 'user', None, None),
+    ('get', '/api/users/subscriptions/?recipes_limit=3', 'user', None,
+     None),
+    ('post', '/api/users/{free_author}/subscribe/', 'user', None, None),
+    ('delete', '/api/users/{free_author}/subscribe/', 'user', None, None),
+    ('post', '/api/users/', 'anon', user_payload, None),
+    ('post', '/api/auth/token/login/', 'anon',
+     lambda ctx: {'email': 'bench_user@bench.ru', 'password': PASSWORD},
+     'token'),
+    ('post', '/api/auth/token/logout/', 'token', None, None),
+)
+
+
+class RollbackError(Exception):
+    pass
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    index = max(0, -(-len(values) * percent // 100) - 1)
+    return values[index]
+
+
+class Command(BaseCommand):
+    help = ('Создаёт воспроизводимый синтетический набор данных, прогоняет '
+            'все эндпоинты API через тестовый клиент и выводит в JSON '
+            'перцентили задержки и число запросов к БД.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', default=50, type=int)
+        parser.add_argument('--recipes', default=200, type=int)
+        parser.add_argument('--ingredients', default=500, type=int)
+        parser.add_argument('--ingredients-per-recipe', default=6, type=int)
+        parser.add_argument('--favorites', default=20, type=int)
+        parser.add_argument('--carts', default=5, type=int)
+        parser.add_argument('--subscriptions', default=10, type=int)
+        parser.add_argument('--repeat', default=20, type=int)
+        parser.add_argument('--warmup', default=2, type=int)
+        parser.add_argument('--seed', default=1, type=int)
+        parser.add_argument('--output', default=None, type=str)
+
+    def create_data(self, options):
+        rng = random.Random(options['seed'])
+        user = User.objects.create_user(
+            username='bench_user', email='bench_user@bench.ru',
+            first_name='bench', last_name='user', password=PASSWORD)
+        User.objects.bulk_create(
+            User(username=f'bench_author_{i}',
+                 email=f'bench_author_{i}@bench.ru', first_name='bench',
+                 last_name='author', password=f'!bench_{i}')
+            for i in range(options['users'])
+        )
+        authors = list(User.objects.filter(
+            username__startswith='bench_author_').order_by('pk'))
+        free_author = authors.pop()
+        Tag.objects.bulk_create(
+            Tag(name=f'bench_tag_{i}', color=f'#BEC{i:03d}',
+                slug=f'bench_tag_{i}')
+            for i in range(3)
+        )
+        tags = list(Tag.objects.filter(
+            slug__startswith='bench_tag_').order_by('pk'))
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'bench_ingredient_{i:05d}',
+                       measurement_unit=rng.choice(('г', 'мл', 'шт')))
+            for i in range(options['ingredients'])
+        )
+        ingredients = list(Ingredient.objects.filter(
+            name__startswith='bench_ingredient_').order_by('pk'))
+        Recipe.objects.bulk_create(
+            Recipe(author=rng.choice(authors), name=f'bench_recipe_{i}',
+                   text='bench', cooking_time=rng.randint(1, 120))
+            for i in range(options['recipes'] + 1)
+        )
+        recipes = list(Recipe.objects.filter(
+            name__startswith='bench_recipe_').order_by('pk'))
+        free_recipe = recipes.pop()
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag=tag)
+            for recipe in recipes
+            for tag in rng.sample(tags, rng.randint(1, len(tags)))
+        )
+        per_recipe = min(options['ingredients_per_recipe'], len(ingredients))
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                             amount=rng.randint(1, 500))
+            for recipe in recipes
+            for ingredient in rng.sample(ingredients, per_recipe)
+        )
+        for model, field, count, choices in (
+                (Favorite, 'recipe', options['favorites'], recipes),
+                (ShoppingCart, 'recipe', options['carts'], recipes),
+                (Subscription, 'author', options['subscriptions'], authors)):
+            count = min(count, len(choices))
+            model.objects.bulk_create(
+                model(user=subscriber, **{field: target})
+                for subscriber in [user] + authors
+                for target in rng.sample(choices, count)
+                if target.pk != subscriber.pk
+            )
+        call_command('repair_counters', stdout=io.StringIO())
+        call_command('repair_shopping_lists', stdout=io.StringIO())
+        TimelineEntry.objects.rebuild()
+        Recipe.objects.update_search_vector()
+        image = io.BytesIO()
+        Image.new('RGB', (16, 16), (200, 100, 50)).save(image, 'PNG')
+        return user, {
+            'author': authors[0].pk,
+            'free_author': free_author.pk,
+            'tag': tags[0].pk,
+            'tag_slug': tags[0].slug,
+            'ingredient': ingredients[0].pk,
+            'ingredient_prefix': 'bench_ingredient_00',
+            'ingredients': [ingredient.pk
+                            for ingredient in ingredients[:per_recipe]],
+            'recipe': recipes[0].pk,
+            'free_recipe': free_recipe.pk,
+            'image': 'data:image/png;base64,' + base64.b64encode(
+                image.getvalue()).decode(),
+        }
+
+    @staticmethod
+    def request(clients, ctx, method, url, client, payload):
+        data = payload(ctx) if payload else None
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = getattr(clients[client], method)(
+                url.format(**ctx), data, format='json')
+            if getattr(response, 'streaming', False):
+                for _ in response.streaming_content:
+                    pass
+            duration = time.perf_counter() - start
+        return response, duration, len(queries)
+
+    def run(self, user, ctx, options):
+        clients = {'user': APIClient(), 'anon': APIClient(),
+                   'token': APIClient()}
+        clients['user'].force_authenticate(user)
+        results = {f'{method.upper()} {url}': {'ms': [], 'queries': []}
+                   for method, url, *_ in ENDPOINTS}
+        for iteration in range(options['warmup'] + options['repeat']):
+            for method, url, client, payload, store in ENDPOINTS:
+                ctx['n'] = iteration
+                response, duration, queries = self.request(
+                    clients, ctx, method, url, client, payload)
+                if response.status_code >= 400:
+                    raise CommandError(
+                        f'{method.upper()} {url.format(**ctx)} вернул '
+                        f'{response.status_code}: {response.content[:200]}')
+                if store:
+                    data = response.json()
+                    ctx[store] = data.get('id', data.get('auth_token'))
+                    if store == 'token':
+                        clients['token'].credentials(
+                            HTTP_AUTHORIZATION=f'Token {ctx["token"]}')
+                if iteration < options['warmup']:
+                    continue
+                result = results[f'{method.upper()} {url}']
+                result['ms'].append(duration * 1000)
+                result['queries'].append(queries)
+        return {
+            name: {
+                **{f'p{percent}_ms': round(percentile(result['ms'],
+                                                      percent), 2)
+                   for percent in PERCENTILES},
+                'mean_ms': round(statistics.mean(result['ms']), 2),
+                'queries': max(result['queries']),
+                'queries_min': min(result['queries']),
+            }
+            for name, result in results.items()
+        }
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat должен быть не меньше 1')
+        if User.objects.filter(username='bench_user').exists():
+            raise CommandError('В базе уже есть данные бенчмарка')
+        started = time.perf_counter()
+        # Картинки из POST и PATCH не откатываются вместе с транзакцией,
+        # поэтому сохраняются во временный каталог.
+        with tempfile.TemporaryDirectory() as media_root, override_settings(
+                CACHES=BENCHMARK_CACHES, CACHE_VERSION_TTL=None,
+                MEDIA_ROOT=media_root):
+            cache.clear()
+            try:
+                with transaction.atomic():
+                    user, ctx = self.create_data(options)
+                    seeded = time.perf_counter()
+                    endpoints = self.run(user, ctx, options)
+                    raise RollbackError
+            except RollbackError:
+                pass
+        report = {
+            'database': connection.vendor,
+            'dataset': {key: options[key] for key in (
+                'users', 'recipes', 'ingredients', 'ingredients_per_recipe',
+                'favorites', 'carts', 'subscriptions', 'seed')},
+            'repeat': options['repeat'],
+            'warmup': options['warmup'],
+            'endpoints': endpoints,
+        }
+        output = json.dumps(report, indent=2, sort_keys=True,
+                            ensure_ascii=False) + '\n'
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output, ending='')
+        self.stderr.write(
+            f'Данные созданы за {seeded - started:.1f} с, '
+            f'замеры заняли {time.perf_counter() - seeded:.1f} с')
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api.cache import get_stats
+
+CACHE_NAMES = ('recipes', 'tags', 'ingredients', 'auth_tokens')
+
+
+class Command(BaseCommand):
+    help = 'Выводит статистику попаданий в кэш ответов API.'
+
+    def handle(self, *args, **options):
+        for name in CACHE_NAMES:
+            hits, misses = get_stats(name)
+            total = hits + misses
+            ratio = hits / total if total else 0
+            self.stdout.write(
+                f'{name}: попаданий {hits}, промахов {misses}, '
+                f'доля попаданий {ratio:.1%}'
+            )
@@ -0,0 +1,141 @@
+import http.client
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle
+from urllib.error import HTTPError
+from urllib.parse import quote, urlsplit
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+
+from .benchmark import PERCENTILES, percentile
+
+# (путь, вес в смешанной нагрузке, нужна ли авторизация)
+PATHS = (
+    ('/api/recipes/?limit=6', 6, False),
+    ('/api/ingredients/?name=са', 3, False),
+    ('/api/recipes/download_shopping_cart/', 1, True),
+)
+UPLOAD_PATH = '/api/recipes/'
+UPLOAD_SIZE = 256 * 1024
+UPLOAD_CHUNK = 8 * 1024
+
+
+class Command(BaseCommand):
+    help = ('Нагружает запущенный сервер параллельными клиентами и выводит '
+            'в JSON пропускную способность и перцентили задержки. '
+            'Запустите для WSGI- и ASGI-режима и сравните результаты.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('base_url', type=str)
+        parser.add_argument('--clients', default=32, type=int)
+        parser.add_argument('--duration', default=20, type=float)
+        parser.add_argument('--token', default=None, type=str)
+        parser.add_argument('--slow-uploads', default=0, type=int)
+        parser.add_argument('--upload-rate', default=64 * 1024, type=int)
+        parser.add_argument('--output', default=None, type=str)
+
+    @staticmethod
+    def request(url, token):
+        request = Request(url)
+        if token:
+            request.add_header('Authorization', f'Token {token}')
+        start = time.perf_counter()
+        try:
+            with urlopen(request, timeout=60) as response:
+                response.read()
+                status = response.status
+        except HTTPError as error:
+            status = error.code
+        return status, time.perf_counter() - start
+
+    def client(self, base_url, paths, token, deadline):
+        results = []
+        for path in paths:
+            if time.monotonic() >= deadline:
+                break
+            status, duration = self.request(
+                base_url + quote(path, safe='/?=&'), token)
+            results.append((path, status, duration))
+        return results
+
+    @staticmethod
+    def slow_upload(base_url, token, rate, deadline):
+        results = []
+        url = urlsplit(base_url)
+        body = json.dumps({'image': 'data:image/png;base64,' + 'A' * (
+            UPLOAD_SIZE)}).encode()
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            connection = http.client.HTTPConnection(url.hostname, url.port,
+                                                    timeout=60)
+            connection.putrequest('POST', UPLOAD_PATH)
+            connection.putheader('Content-Type', 'application/json')
+            connection.putheader('Content-Length', str(len(body)))
+            if token:
+                connection.putheader('Authorization', f'Token {token}')
+            connection.endheaders()
+            for offset in range(0, len(body), UPLOAD_CHUNK):
+                connection.send(body[offset:offset + UPLOAD_CHUNK])
+                time.sleep(UPLOAD_CHUNK / rate)
+            response = connection.getresponse()
+            response.read()
+            connection.close()
+            results.append((f'POST {UPLOAD_PATH} (медленная загрузка)',
+                            response.status, time.perf_counter() - start))
+        return results
+
+    def handle(self, *args, **options):
+        if options['clients'] < 1:
+            raise CommandError('--clients должен быть больше нуля')
+        base_url = options['base_url'].rstrip('/')
+        token = options['token']
+        mix = [path for path, weight, auth in PATHS
+               if token or not auth for _ in range(weight)]
+        deadline = time.monotonic() + options['duration']
+        started = time.monotonic()
+        with ThreadPoolExecutor(
+                options['clients'] + options['slow_uploads']) as executor:
+            futures = [
+                executor.submit(self.client, base_url,
+                                cycle(mix[i % len(mix):] + mix[:i % len(mix)]),
+                                token, deadline)
+                for i in range(options['clients'])
+            ] + [
+                executor.submit(self.slow_upload, base_url, token,
+                                options['upload_rate'], deadline)
+                for _ in range(options['slow_uploads'])
+            ]
+            results = [result for future in futures
+                       for result in future.result()]
+        elapsed = time.monotonic() - started
+        report = {
+            'base_url': base_url,
+            'clients': options['clients'],
+            'slow_uploads': options['slow_uploads'],
+            'duration_s': round(elapsed, 2),
+            'requests': len(results),
+            'requests_per_s': round(len(results) / elapsed, 2),
+            'errors': sum(status >= 400 for _, status, _ in results),
+            'paths': {},
+        }
+        for path in sorted({path for path, _, _ in results}):
+            durations = [duration * 1000
+                         for result_path, _, duration in results
+                         if result_path == path]
+            report['paths'][path] = {
+                'requests': len(durations),
+                'mean_ms': round(statistics.mean(durations), 2),
+                **{f'p{percent}_ms': round(percentile(durations, percent),
+                                           2)
+                   for percent in PERCENTILES},
+            }
+        output = json.dumps(report, indent=2, sort_keys=True,
+                            ensure_ascii=False) + '\n'
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output, ending='')
@@ -0,0 +1,130 @@
+import hashlib
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+
+from .cache import cache_is_shared
+from .db_router import use_replica
+
+logger = logging.getLogger('api.sql')
+
+PLACEHOLDER_LIST = re.compile(r'%s(?:, %s)+')
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+    @property
+    def total_time(self):
+        return sum(duration for _, duration in self.queries)
+
+    @property
+    def slowest(self):
+        return max(self.queries, key=lambda query: query[1], default=None)
+
+    def repeated_shapes(self, threshold):
+        shapes = Counter(
+            PLACEHOLDER_LIST.sub('%s, ...', sql) for sql, _ in self.queries)
+        return [(shape, count) for shape, count in shapes.most_common()
+                if count >= threshold]
+
+
+def get_view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return request.path
+    view = getattr(match.func, 'cls', match.func)
+    actions = getattr(match.func, 'actions', None) or {}
+    action = actions.get(request.method.lower())
+    if action:
+        return f'{view.__name__}.{action}'
+    return getattr(view, '__name__', match.view_name)
+
+
+class SQLInstrumentationMiddleware:
+    def __init__(self, get_response):
+        if not settings.SQL_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        slowest = recorder.slowest
+        timings = [
+            f'db;desc="{len(recorder.queries)} queries";'
+            f'dur={recorder.total_time * 1000:.1f}'
+        ]
+        if slowest is not None:
+            timings.append(f'db-slowest;dur={slowest[1] * 1000:.1f}')
+            logger.debug('%s: самый медленный запрос %.1f мс: %s',
+                         get_view_name(request), slowest[1] * 1000,
+                         slowest[0])
+        response['Server-Timing'] = ', '.join(timings)
+        for shape, count in recorder.repeated_shapes(
+                settings.SQL_N_PLUS_ONE_THRESHOLD):
+            logger.warning('%s: возможная проблема N+1, запрос выполнен '
+                           '%d раз: %s', get_view_name(request), count, shape)
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    def __init__(self, get_response):
+        if settings.READ_REPLICA_ALIAS not in settings.DATABASES:
+            raise MiddlewareNotUsed
+        if not cache_is_shared():
+            logger.warning('Чтение с реплики отключено: привязке клиента '
+                           'к основной базе нужен общий кэш.')
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    @staticmethod
+    def pin_key(request):
+        identity = request.META.get('HTTP_AUTHORIZATION') or (
+            request.COOKIES.get(settings.SESSION_COOKIE_NAME))
+        if not identity:
+            return None
+        digest = hashlib.sha1(identity.encode()).hexdigest()
+        return f'replica_pin:{digest}'
+
+    def __call__(self, request):
+        try:
+            response = self.get_response(request)
+        finally:
+            use_replica(False)
+        key = self.pin_key(request)
+        if request.method not in SAFE_METHODS and key:
+            cache.set(key, True, settings.REPLICA_STICKY_SECONDS)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return
+        actions = getattr(view_func, 'actions', None) or {}
+        action = actions.get(request.method.lower(), actions.get('get'))
+        view = getattr(view_func, 'cls', None)
+        if action not in getattr(view, 'read_replica_actions', ()):
+            return
+        key = self.pin_key(request)
+        if key and cache.get(key):
+            return
+        use_replica(True)
@@ -0,0 +1,7 @@
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.settings import APISettings
+
+
+class FileFormatNegotiation(DefaultContentNegotiation):
+    # ?format= выбирает формат файла, а не рендерер ответа.
+    settings = APISettings({'URL_FORMAT_OVERRIDE': None})
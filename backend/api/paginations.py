@@ -1,4 +1,5 @@
-from rest_framework.pagination import (LimitOffsetPagination,
+from rest_framework.pagination import (CursorPagination,
+                                       LimitOffsetPagination,
                                        PageNumberPagination)
 
 
@@ -13,3 +14,14 @@ class LimitPageNumberPagination(LimitOffsetPagination, PageNumberPagination):
 
 class CustomPagination(PageNumberPagination):
     page_size_query_param = 'limit'
+
+
+class RecipeCursorPagination(CursorPagination):
+    page_size = 6
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    ordering = ('-creation_date', '-id')
+
+
+class FeedCursorPagination(RecipeCursorPagination):
+    ordering = ('-creation_date', '-recipe_id')
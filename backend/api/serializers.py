@@ -1,10 +1,11 @@
+from django.db import transaction
 from djoser.serializers import UserSerializer
 from rest_framework import serializers
 
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Tag)
+                            ShoppingCart, ShoppingListItem, Tag)
 from users.models import Subscription, User
-from .fields import Base64ImageField
+from .fields import Base64ImageField, ImageRenditionsField
 
 
 class CustomUserSerializer(UserSerializer):
@@ -16,7 +17,11 @@ class CustomUserSerializer(UserSerializer):
                   'last_name', 'is_subscribed')
 
     def get_is_subscribed(self, obj):
-        request_user = self.context.get('request').user.id
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        request_user = self.context.get('request').user
+        if request_user.is_anonymous:
+            return False
         return Subscription.objects.filter(
             author=obj.id, user=request_user
         ).exists()
@@ -68,36 +73,80 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = '__all__',
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class SparseFieldsetMixin:
+    fields_query_param = 'fields'
+    omit_query_param = 'omit'
+
+    @staticmethod
+    def parse_fields(value):
+        if value is None:
+            return set()
+        return {name.strip() for name in value.split(',') if name.strip()}
+
+    @classmethod
+    def selected_fields(cls, request):
+        fields = cls.Meta.fields
+        if request is None:
+            return fields
+        requested = cls.parse_fields(
+            request.query_params.get(cls.fields_query_param))
+        omitted = cls.parse_fields(
+            request.query_params.get(cls.omit_query_param))
+        unknown = sorted((requested | omitted) - set(fields))
+        if unknown:
+            raise serializers.ValidationError({
+                'fields': f'Неизвестные поля: {", ".join(unknown)}.'
+            })
+        return tuple(
+            name for name in fields
+            if (not requested or name in requested) and name not in omitted
+        )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        selected = self.selected_fields(self.context.get('request'))
+        for name in set(self.fields) - set(selected):
+            self.fields.pop(name)
+
+
+class RecipeSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     tags = TagSerializer(many=True, read_only=True)
     author = CustomUserSerializer(read_only=True)
     ingredients = IngredientRecipeSerializer(
         source='recipeingredient', many=True)
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
+    image_renditions = ImageRenditionsField()
 
     class Meta:
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients', 'is_favorited',
-                  'is_in_shopping_cart', 'name', 'image', 'text',
-                  'cooking_time')
+                  'is_in_shopping_cart', 'name', 'image', 'image_renditions',
+                  'text', 'cooking_time')
 
     def get_is_favorited(self, obj):
-        request_user = self.context.get('request').user.id
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
+        request_user = self.context.get('request').user
+        if request_user.is_anonymous:
+            return False
         return Favorite.objects.filter(
             recipe=obj.id, user=request_user
         ).exists()
 
     def get_is_in_shopping_cart(self, obj):
-        request_user = self.context.get('request').user.id
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
+        request_user = self.context.get('request').user
+        if request_user.is_anonymous:
+            return False
         return ShoppingCart.objects.filter(
             recipe=obj.id, user=request_user
         ).exists()
 
 
 class AddIngredientSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all())
+    id = serializers.IntegerField()
     amount = serializers.IntegerField()
 
     class Meta:
@@ -106,39 +155,53 @@ class AddIngredientSerializer(serializers.ModelSerializer):
 
 
 class CreateRecipeSerializer(serializers.ModelSerializer):
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(), many=True
-    )
+    tags = serializers.ListField(child=serializers.IntegerField())
     author = CustomUserSerializer(read_only=True)
     ingredients = AddIngredientSerializer(many=True)
     image = Base64ImageField(required=True, allow_null=True)
 
+    @staticmethod
+    def check_ids(model, ids, field, message):
+        found = set(
+            model.objects.filter(id__in=ids).values_list('id', flat=True))
+        missing = sorted(set(ids) - found)
+        if missing:
+            raise serializers.ValidationError(
+                {field: f'{message}: {", ".join(map(str, missing))}.'})
+
     def validate(self, data):
-        ingredients = data['ingredients']
-        ingredients_recipes = []
-        for ingredient in ingredients:
-            id = ingredient['id']
-            if id in ingredients_recipes:
+        RecipeSerializer.selected_fields(self.context.get('request'))
+        tags = data.get('tags')
+        if tags is not None:
+            if len(set(tags)) != len(tags):
                 raise serializers.ValidationError(
-                    {
-                        'ingredients': 'Ингредиенты должны быть уникальными.'
-                    }
-                )
-            ingredients_recipes.append(id)
-            amount = ingredient['amount']
-            if int(amount) <= 0:
+                    {'tags': 'Теги должны быть уникальными.'})
+            self.check_ids(Tag, tags, 'tags', 'Не найдены теги')
+        ingredients = data.get('ingredients')
+        if ingredients is not None:
+            ids = {ingredient['id'] for ingredient in ingredients}
+            if len(ids) != len(ingredients):
                 raise serializers.ValidationError(
                     {
-                        'amount': 'Количество ингредиента'
-                        'должно быть дольше нуля.'
+                        'ingredients': 'Ингредиенты должны быть уникальными.'
                     }
                 )
+            for ingredient in ingredients:
+                amount = ingredient['amount']
+                if int(amount) <= 0:
+                    raise serializers.ValidationError(
+                        {
+                            'amount': 'Количество ингредиента'
+                            'должно быть дольше нуля.'
+                        }
+                    )
+            self.check_ids(Ingredient, ids, 'ingredients',
+                           'Не найдены ингредиенты')
         return data
 
     @staticmethod
     def add_tag(tags, recipe):
-        for tag in tags:
-            recipe.tags.add(tag)
+        recipe.tags.add(*tags)
 
     @staticmethod
     def add_ingredient(ingredients, recipe):
@@ -147,31 +210,88 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
             recipe_ingredients.append(
                 RecipeIngredient(
                     recipe=recipe,
-                    ingredient=ingredient['id'],
+                    ingredient_id=ingredient['id'],
                     amount=ingredient['amount']
                 )
             )
         RecipeIngredient.objects.bulk_create(recipe_ingredients)
 
+    @staticmethod
+    def update_ingredients(ingredients, recipe):
+        current = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in RecipeIngredient.objects.filter(
+                recipe=recipe)
+        }
+        created = []
+        changed = []
+        amounts = {}
+        for ingredient in ingredients:
+            recipe_ingredient = current.pop(ingredient['id'], None)
+            if recipe_ingredient is None:
+                created.append(
+                    RecipeIngredient(
+                        recipe=recipe,
+                        ingredient_id=ingredient['id'],
+                        amount=ingredient['amount']
+                    )
+                )
+                amounts[ingredient['id']] = ingredient['amount']
+            elif recipe_ingredient.amount != ingredient['amount']:
+                amounts[ingredient['id']] = (
+                    ingredient['amount'] - (recipe_ingredient.amount or 0))
+                recipe_ingredient.amount = ingredient['amount']
+                changed.append(recipe_ingredient)
+        for recipe_ingredient in current.values():
+            amounts[recipe_ingredient.ingredient_id] = -(
+                recipe_ingredient.amount or 0)
+        if current:
+            RecipeIngredient.objects.filter(
+                pk__in=[item.pk for item in current.values()]
+            ).delete()
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ['amount'])
+        if created:
+            RecipeIngredient.objects.bulk_create(created)
+        if amounts:
+            ShoppingListItem.objects.add_amounts(
+                ShoppingCart.objects.filter(
+                    recipe=recipe).values_list('user', flat=True),
+                amounts)
+
     def create(self, data):
         tags = data.pop('tags')
         author = self.context['request'].user
         ingredients = data.pop('ingredients')
-        recipe = Recipe.objects.create(author=author, **data)
-        self.add_tag(tags, recipe)
-        self.add_ingredient(ingredients, recipe)
+        with transaction.atomic():
+            recipe = Recipe.objects.create(author=author, **data)
+            self.add_tag(tags, recipe)
+            self.add_ingredient(ingredients, recipe)
+            Recipe.objects.filter(pk=recipe.pk).update_search_vector()
         return recipe
 
     def update(self, instance, data):
-        instance.tags.clear()
-        RecipeIngredient.objects.filter(recipe=instance).delete()
-        self.add_tag(data.pop('tags'), instance)
-        self.add_ingredient(data.pop('ingredients'), instance)
-        return super().update(instance, data)
+        tags = data.pop('tags', None)
+        ingredients = data.pop('ingredients', None)
+        with transaction.atomic():
+            if tags is not None:
+                instance.tags.set(tags)
+            if ingredients is not None:
+                self.update_ingredients(ingredients, instance)
+            if 'image' in data:
+                instance.renditions_ready = False
+                instance.renditions_attempts = 0
+            instance = super().update(instance, data)
+            Recipe.objects.filter(pk=instance.pk).update_search_vector()
+        return instance
 
     def to_representation(self, instance):
         request = self.context.get('request')
         context = {'request': request}
+        fields = RecipeSerializer.selected_fields(request)
+        instance = Recipe.objects.with_user_flags(
+            request.user, fields).with_related(
+            request.user, fields).get(pk=instance.pk)
         return RecipeSerializer(instance, context=context).data
 
     class Meta:
@@ -181,10 +301,11 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
 
 
 class ShortRecipeSerializer(serializers.ModelSerializer):
+    image_renditions = ImageRenditionsField()
 
     class Meta:
         model = Recipe
-        fields = ['id', 'name', 'image', 'cooking_time']
+        fields = ['id', 'name', 'image', 'image_renditions', 'cooking_time']
 
 
 class SubscriptionSerializer(serializers.ModelSerializer):
@@ -194,8 +315,7 @@ class SubscriptionSerializer(serializers.ModelSerializer):
     first_name = serializers.ReadOnlyField(source='author.first_name')
     last_name = serializers.ReadOnlyField(source='author.last_name')
     is_subscribed = serializers.SerializerMethodField()
-    recipes = ShortRecipeSerializer(many=True, read_only=True,
-                                    source='author.recipes')
+    recipes = serializers.SerializerMethodField()
     recipes_count = serializers.SerializerMethodField()
 
     class Meta:
@@ -203,14 +323,43 @@ class SubscriptionSerializer(serializers.ModelSerializer):
         fields = ('email', 'id', 'username', 'first_name', 'last_name',
                   'is_subscribed', 'recipes', 'recipes_count')
 
+    @staticmethod
+    def get_recipes_limit(request):
+        recipes_limit = request.query_params.get('recipes_limit')
+        if recipes_limit is None:
+            return None
+        try:
+            recipes_limit = int(recipes_limit)
+        except ValueError:
+            recipes_limit = -1
+        if recipes_limit < 0:
+            raise serializers.ValidationError({
+                'recipes_limit': 'Укажите целое неотрицательное число.'
+            })
+        return recipes_limit
+
     def get_is_subscribed(self, obj):
         request_user = self.context.get('request').user.id
+        if obj.user_id == request_user:
+            return True
         return Subscription.objects.filter(
             author=obj.author_id, user=request_user
         ).exists()
 
+    def get_recipes(self, obj):
+        request = self.context.get('request')
+        if hasattr(obj.author, 'latest_recipes'):
+            recipes = obj.author.latest_recipes
+        else:
+            recipes = obj.author.recipes.all()
+            recipes_limit = self.get_recipes_limit(request)
+            if recipes_limit is not None:
+                recipes = recipes[:recipes_limit]
+        return ShortRecipeSerializer(
+            recipes, many=True, context={'request': request}).data
+
     def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author=obj.author.id).count()
+        return obj.author.recipes_count
 
 
 class FavoriteSerializer(serializers.ModelSerializer):
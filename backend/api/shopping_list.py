@@ -0,0 +1,95 @@
+import csv
+import os
+import tempfile
+from functools import lru_cache
+
+from django.http import FileResponse, StreamingHttpResponse
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from backend.settings import BASE_DIR
+from recipes.models import ShoppingListItem
+
+FONT_NAME = 'ArialUni'
+FONT_PATH = os.path.join(BASE_DIR, '/app/backend_static/fonts/Arial.TTF')
+
+FILENAME = 'shopping_cart'
+FORMATS = ('pdf', 'txt', 'csv')
+TITLE = 'Список покупок'
+PAGE_TOP = 750
+PAGE_BOTTOM = 50
+LINE_HEIGHT = 20
+PDF_MEMORY_LIMIT = 1024 * 1024
+
+
+@lru_cache(maxsize=None)
+def register_font():
+    pdfmetrics.registerFont(TTFont(FONT_NAME, FONT_PATH))
+    return FONT_NAME
+
+
+def get_shopping_list(user):
+    return ShoppingListItem.objects.filter(
+        user=user
+    ).values_list(
+        'ingredient__name',
+        'ingredient__measurement_unit',
+        'amount'
+    ).order_by('ingredient__name')
+
+
+def iter_lines(items):
+    for i, (name, measurement_unit, total_amount) in enumerate(items, 1):
+        yield f'{i}. {name} ({measurement_unit}) - {total_amount}'
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def iter_csv(items):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'measurement_unit', 'total_amount'))
+    for row in items:
+        yield writer.writerow(row)
+
+
+def build_pdf(items):
+    font = register_font()
+    buffer = tempfile.SpooledTemporaryFile(max_size=PDF_MEMORY_LIMIT)
+    pdf = canvas.Canvas(buffer)
+    pdf.setFont(font, 20)
+    pdf.drawString(200, PAGE_TOP, TITLE)
+    pdf.setFont(font, 16)
+    y = PAGE_TOP - 2 * LINE_HEIGHT
+    for line in iter_lines(items):
+        if y < PAGE_BOTTOM:
+            pdf.showPage()
+            pdf.setFont(font, 16)
+            y = PAGE_TOP
+        pdf.drawString(100, y, line)
+        y -= LINE_HEIGHT
+    pdf.showPage()
+    pdf.save()
+    buffer.seek(0)
+    return buffer
+
+
+def shopping_list_response(user, file_format):
+    items = get_shopping_list(user).iterator()
+    if file_format == 'pdf':
+        return FileResponse(build_pdf(items), as_attachment=True,
+                            filename=f'{FILENAME}.pdf',
+                            content_type='application/pdf')
+    if file_format == 'csv':
+        content, content_type = iter_csv(items), 'text/csv'
+    else:
+        content = (line + '\n' for line in iter_lines(items))
+        content_type = 'text/plain'
+    response = StreamingHttpResponse(
+        content, content_type=f'{content_type}; charset=utf-8')
+    response['Content-Disposition'] = (
+        f'attachment; filename="{FILENAME}.{file_format}"')
+    return response
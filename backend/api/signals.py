@@ -0,0 +1,77 @@
+import time
+
+from django.conf import settings
+from django.core.signals import request_finished, request_started
+from django.db import connections, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from users.models import User
+from .authentication import invalidate_user_tokens
+from .cache import bump_version
+from .ingredient_index import ingredient_index
+
+
+def bump_versions_on_commit(*names):
+    def bump():
+        for name in names:
+            bump_version(name)
+    transaction.on_commit(bump)
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_index(sender, **kwargs):
+    transaction.on_commit(ingredient_index.invalidate)
+    bump_versions_on_commit('recipes')
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_tags(sender, **kwargs):
+    bump_versions_on_commit('tags', 'recipes')
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipes(sender, **kwargs):
+    bump_versions_on_commit('recipes')
+
+
+@receiver(post_save, sender=Ingredient)
+def update_recipes_search_vector(sender, instance, created, **kwargs):
+    if not created:
+        Recipe.objects.filter(ingredients=instance).update_search_vector()
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    invalidate_user_tokens(instance.user_id)
+
+
+@receiver((post_save, post_delete), sender=User)
+def invalidate_user(sender, instance, **kwargs):
+    invalidate_user_tokens(instance.pk)
+
+
+@receiver(request_started)
+def close_unusable_connections(sender, **kwargs):
+    if not settings.DB_HEALTH_CHECKS:
+        return
+    now = time.monotonic()
+    for connection in connections.all():
+        if connection.connection is None:
+            continue
+        idle = now - getattr(connection, 'last_request_finished', now)
+        if idle >= settings.DB_HEALTH_CHECK_IDLE and (
+                not connection.is_usable()):
+            connection.close()
+
+
+@receiver(request_finished)
+def mark_connections_used(sender, **kwargs):
+    now = time.monotonic()
+    for connection in connections.all():
+        if connection.connection is not None:
+            connection.last_request_finished = now
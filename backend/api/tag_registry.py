@@ -0,0 +1,17 @@
+from recipes.models import Tag
+from .cache import ProcessCache
+
+
+class TagRegistry(ProcessCache):
+    version_name = 'tags'
+
+    def load(self):
+        return list(Tag.objects.order_by('id').values(
+            'id', 'name', 'color', 'slug'))
+
+
+tag_registry = TagRegistry()
+
+
+def tag_choices():
+    return [(tag['slug'], tag['name']) for tag in tag_registry.get()]
@@ -0,0 +1,84 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from users.models import Subscription, User
+from .views import RecipesViewSet, UsersViewSet
+
+SIZES = (1, 6, 20)
+ENDPOINTS = (
+    (RecipesViewSet, 'list', '/api/recipes/?limit={size}'),
+    (RecipesViewSet, 'retrieve', '/api/recipes/{recipe}/'),
+    (RecipesViewSet, 'feed', '/api/recipes/feed/?limit={size}'),
+    (UsersViewSet, 'user_subscriptions',
+     '/api/users/subscriptions/?recipes_limit=3'),
+)
+
+
+class QueryBudgetTest(TestCase):
+
+    @staticmethod
+    def create_data(size):
+        user = User.objects.create(
+            username=f'budget_user_{size}',
+            email=f'budget_user_{size}@budget.ru',
+            first_name='budget', last_name='user',
+            password=f'budget_user_{size}')
+        author = User.objects.create(
+            username=f'budget_author_{size}',
+            email=f'budget_author_{size}@budget.ru',
+            first_name='budget', last_name='author',
+            password=f'budget_author_{size}')
+        Subscription.objects.create(user=user, author=author)
+        tags = [
+            Tag.objects.create(name=f'budget_tag_{size}_{i}',
+                               color=f'#B{size:03d}{i:02d}',
+                               slug=f'budget_tag_{size}_{i}')
+            for i in range(3)
+        ]
+        ingredients = [
+            Ingredient.objects.create(name=f'budget_ingredient_{size}_{i}',
+                                      measurement_unit='г')
+            for i in range(5)
+        ]
+        recipes = []
+        for i in range(size):
+            recipe = Recipe.objects.create(
+                author=author, name=f'budget_recipe_{size}_{i}',
+                text='budget', cooking_time=1)
+            recipe.tags.set(tags)
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                                 amount=1)
+                for ingredient in ingredients)
+            Favorite.objects.create(user=user, recipe=recipe)
+            ShoppingCart.objects.create(user=user, recipe=recipe)
+            recipes.append(recipe)
+        return user, recipes
+
+    def count_queries(self, size):
+        user, recipes = self.create_data(size)
+        client = APIClient()
+        client.force_authenticate(user)
+        counts = {}
+        for viewset, action, url in ENDPOINTS:
+            url = url.format(size=size, recipe=recipes[0].id)
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            counts[(viewset, action)] = len(queries)
+        return counts
+
+    def test_query_budget(self):
+        results = {size: self.count_queries(size) for size in SIZES}
+        for viewset, action, url in ENDPOINTS:
+            with self.subTest(endpoint=f'{viewset.__name__}.{action}'):
+                counts = [results[size][(viewset, action)] for size in SIZES]
+                self.assertLessEqual(max(counts),
+                                     viewset.query_budget[action])
+                self.assertEqual(len(set(counts)), 1,
+                                 f'Число запросов зависит от размера '
+                                 f'страницы: {counts}')
@@ -1,31 +1,29 @@
-import io
-import os
-
-from django.db.models import Sum
-from django.http import FileResponse, HttpResponse
+from django.db import transaction
+from django.db.models import OuterRef, Prefetch, Subquery
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfgen import canvas
-from rest_framework import permissions, status, viewsets
+from rest_framework import permissions, serializers, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
-from backend.settings import BASE_DIR
 from users.models import Subscription, User
-from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Tag)
-from .filters import RecipesFilters, IngredientFilter
-from .paginations import LimitPageNumberPagination, CustomPagination
+from recipes.models import (Favorite, Ingredient, Recipe, ShoppingCart, Tag,
+                            TimelineEntry)
+from .cache import VersionedCacheMixin
+from .filters import RecipeSearchFilter, RecipesFilters
+from .ingredient_index import ingredient_index
+from .negotiation import FileFormatNegotiation
+from .paginations import (CustomPagination, FeedCursorPagination,
+                          LimitPageNumberPagination, RecipeCursorPagination)
 from .permissions import IsAuthorOrReadOnly
 from .serializers import (CreateRecipeSerializer, CustomUserSerializer,
                           FavoriteSerializer, IngredientSerializer,
                           RecipeSerializer, ShoppingCartSerializer,
                           SubscriptionSerializer, TagSerializer)
-
-FONT_PATH = os.path.join(BASE_DIR, '/app/backend_static/fonts/Arial.TTF')
+from .shopping_list import FORMATS, shopping_list_response
+from .tag_registry import tag_registry
 
 
 class UsersViewSet(UserViewSet):
@@ -33,12 +31,16 @@ class UsersViewSet(UserViewSet):
     serializer_class = CustomUserSerializer
     pagination_class = LimitPageNumberPagination
     permission_classes = (permissions.IsAuthenticated,)
+    query_budget = {'user_subscriptions': 3}
+    read_replica_actions = ('list', 'retrieve')
 
     @action(detail=True, methods=['POST', 'DELETE'], url_path='subscribe',
             permission_classes=(permissions.IsAuthenticated,))
     def user_subscribe(self, request, id):
         user = request.user
         author = get_object_or_404(User, pk=id)
+        if request.method == 'POST':
+            SubscriptionSerializer.get_recipes_limit(request)
         try:
             subscription = Subscription.objects.get(
                 user=user,
@@ -74,7 +76,20 @@ class UsersViewSet(UserViewSet):
             permission_classes=(permissions.IsAuthenticated,))
     def user_subscriptions(self, request):
         user = request.user
-        queryset = Subscription.objects.filter(user=user)
+        recipes = Recipe.objects.all()
+        recipes_limit = SubscriptionSerializer.get_recipes_limit(request)
+        if recipes_limit is not None:
+            recipes = recipes.filter(pk__in=Subquery(
+                Recipe.objects.filter(
+                    author=OuterRef('author')
+                ).values('pk')[:recipes_limit]
+            ))
+        queryset = Subscription.objects.filter(user=user).select_related(
+            'author'
+        ).prefetch_related(
+            Prefetch('author__recipes', queryset=recipes,
+                     to_attr='latest_recipes')
+        ).order_by('-id')
         pages = self.paginate_queryset(queryset)
         serializer = SubscriptionSerializer(
             pages,
@@ -84,13 +99,37 @@ class UsersViewSet(UserViewSet):
         return self.get_paginated_response(serializer.data)
 
 
-class RecipesViewSet(viewsets.ModelViewSet):
+class RecipesViewSet(VersionedCacheMixin, viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     pagination_class = CustomPagination
     permission_classes = (IsAuthorOrReadOnly,)
-    filter_backends = [DjangoFilterBackend]
+    filter_backends = [DjangoFilterBackend, RecipeSearchFilter]
     filterset_class = RecipesFilters
-    search_fields = ('name',)
+    query_budget = {'list': 5, 'retrieve': 4, 'feed': 5}
+    read_replica_actions = ('list', 'retrieve')
+    cache_version_name = 'recipes'
+    cache_timeout = 60
+
+    def use_cache(self, request):
+        return request.user.is_anonymous
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if RecipeCursorPagination.cursor_query_param in (
+                    self.request.query_params):
+                self._paginator = RecipeCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def get_queryset(self):
+        user = self.request.user
+        if self.action not in ('retrieve', 'list'):
+            return Recipe.objects.with_user_flags(user)
+        fields = RecipeSerializer.selected_fields(self.request)
+        return Recipe.objects.with_user_flags(user, fields).with_related(
+            user, fields)
 
     def get_serializer_class(self):
         if self.action in ('retrieve', 'list'):
@@ -102,7 +141,8 @@ class RecipesViewSet(viewsets.ModelViewSet):
         data = {'user': request.user.id, 'recipe': pk}
         serializer = serializers(data=data, context={'request': request})
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        with transaction.atomic():
+            serializer.save()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @staticmethod
@@ -157,49 +197,66 @@ class RecipesViewSet(viewsets.ModelViewSet):
         )
         return self.get_paginated_response(serializer.data)
 
-    @action(detail=False, methods=['GET'],
+    @action(detail=False, methods=['GET'], url_path='feed',
             permission_classes=(permissions.IsAuthenticated,))
+    def feed(self, request):
+        user = request.user
+        paginator = FeedCursorPagination()
+        entries = paginator.paginate_queryset(
+            TimelineEntry.objects.filter(user=user).only(
+                'recipe_id', 'creation_date'),
+            request,
+            view=self
+        )
+        recipe_ids = [entry.recipe_id for entry in entries]
+        fields = RecipeSerializer.selected_fields(request)
+        recipes = Recipe.objects.with_user_flags(user, fields).with_related(
+            user, fields).in_bulk(recipe_ids)
+        serializer = RecipeSerializer(
+            [recipes[pk] for pk in recipe_ids if pk in recipes],
+            many=True,
+            context={'request': request}
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['GET'],
+            permission_classes=(permissions.IsAuthenticated,),
+            content_negotiation_class=FileFormatNegotiation)
     def download_shopping_cart(self, request):
         user = request.user
+        file_format = request.query_params.get('format', 'pdf')
+        if file_format not in FORMATS:
+            raise serializers.ValidationError({
+                'format': f'Доступные форматы: {", ".join(FORMATS)}.'
+            })
         if not ShoppingCart.objects.filter(user=user).exists():
             return HttpResponse('Ваш список покупок пуст')
-        shopping_cart = ShoppingCart.objects.filter(
-            user=user
-        ).values_list('recipe', flat=True)
-        recipe_ingredients = RecipeIngredient.objects.filter(
-            recipe__in=shopping_cart
-        ).select_related('ingredient').values_list(
-            'ingredient__name',
-            'ingredient__measurement_unit'
-        ).annotate(total_amount=Sum('amount'))
-        pdfmetrics.registerFont(TTFont('ArialUni', FONT_PATH))
-        buffer = io.BytesIO()
-        pdf = canvas.Canvas(buffer)
-        pdf.setFont('ArialUni', 20)
-        pdf.drawString(200, 750, 'Список покупок')
-        pdf.setFont('ArialUni', 16)
-        y = 710
-        for i, item in enumerate(recipe_ingredients):
-            name_unit = item[0] + ' (' + item[1] + ')'
-            total_amount = item[2]
-            item_string = f'{i+1}. {name_unit} - {total_amount}'
-            pdf.drawString(100, y, item_string)
-            y -= 20
-        pdf.showPage()
-        pdf.save()
-        buffer.seek(0)
-        return FileResponse(buffer, as_attachment=True,
-                            filename='shopping_cart.pdf'
-                            )
+        return shopping_list_response(user, file_format)
 
 
-class IngredientsViewSet(viewsets.ModelViewSet):
+class IngredientsViewSet(VersionedCacheMixin, viewsets.ModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
-    filter_backends = [IngredientFilter]
-    search_fields = ('^name',)
+    cache_version_name = 'ingredients'
+    read_replica_actions = ('list', 'retrieve')
 
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get('name'):
+            return self.cached_response(self.search, request)
+        return super().list(request, *args, **kwargs)
 
-class TagsViewSet(viewsets.ModelViewSet):
+    def search(self, request):
+        return Response(ingredient_index.search(request.query_params['name']))
+
+
+class TagsViewSet(VersionedCacheMixin, viewsets.ModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    cache_version_name = 'tags'
+    read_replica_actions = ('list', 'retrieve')
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(self.list_tags, request)
+
+    def list_tags(self, request):
+        return Response(tag_registry.get())
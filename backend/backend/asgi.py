@@ -1,7 +1,202 @@
+import asyncio
 import os
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-from django.core.asgi import get_asgi_application
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
-application = get_asgi_application()
+BODY_MEMORY_LIMIT = 1024 * 1024
+
+
+class ResponseBuffer:
+
+    def __init__(self, loop, limit):
+        self.loop = loop
+        self.limit = limit
+        self.queue = asyncio.Queue()
+        self.size = 0
+        self.closed = False
+        self.condition = threading.Condition()
+
+    def put(self, message):
+        size = len(message.get('body', b''))
+        with self.condition:
+            self.condition.wait_for(
+                lambda: self.closed or not self.size
+                or self.size + size <= self.limit)
+            if self.closed:
+                raise ConnectionError('Клиент отключился')
+            self.size += size
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, message)
+
+    def release(self, size, closed=False):
+        with self.condition:
+            self.size -= size
+            self.closed = self.closed or closed
+            self.condition.notify_all()
+
+    async def drain(self, send):
+        try:
+            while True:
+                message = await self.queue.get()
+                await send(message)
+                self.release(len(message.get('body', b'')))
+                if (message['type'] == 'http.response.body'
+                        and not message.get('more_body')):
+                    return
+        finally:
+            self.release(0, closed=True)
+
+
+# Django 2.2 не поддерживает асинхронные представления, поэтому запросы
+# выполняются в пулах потоков. Тело запроса читается в цикле событий, а
+# ответ передаётся в цикл событий через буфер: поток ждёт медленного
+# клиента, только если в буфере уже больше ASGI_RESPONSE_BUFFER байт.
+class ThreadedWSGIApplication:
+
+    def __init__(self, wsgi_application, pools, threads, buffer_size):
+        self.wsgi_application = wsgi_application
+        self.buffer_size = buffer_size
+        self.pools = [
+            (prefixes, ThreadPoolExecutor(pool_threads,
+                                          thread_name_prefix=name))
+            for name, prefixes, pool_threads in pools
+        ]
+        self.executor = ThreadPoolExecutor(threads,
+                                           thread_name_prefix='default')
+
+    def get_executor(self, path):
+        for prefixes, executor in self.pools:
+            if path.startswith(prefixes):
+                return executor
+        return self.executor
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise ValueError(f'Неподдерживаемый тип соединения '
+                             f'{scope["type"]}')
+        body = await self.read_body(receive)
+        if body is None:
+            return
+        loop = asyncio.get_event_loop()
+        buffer = ResponseBuffer(loop, self.buffer_size)
+        drain = asyncio.ensure_future(buffer.drain(send))
+        try:
+            await loop.run_in_executor(self.get_executor(scope['path']),
+                                       self.run_wsgi, scope, body, buffer)
+        except BaseException:
+            drain.cancel()
+            raise
+        await drain
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                for _, executor in self.pools:
+                    executor.shutdown(wait=False)
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    @staticmethod
+    async def read_body(receive):
+        body = tempfile.SpooledTemporaryFile(max_size=BODY_MEMORY_LIMIT)
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return None
+            body.write(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+        body.seek(0)
+        return body
+
+    @staticmethod
+    def build_environ(scope, body):
+        server = scope.get('server') or ('localhost', 80)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode().decode(
+                'latin1'),
+            'PATH_INFO': scope['path'].encode().decode('latin1'),
+            'QUERY_STRING': scope['query_string'].decode('latin1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f'HTTP/{scope["http_version"]}',
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': body,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        if scope.get('client'):
+            environ['REMOTE_ADDR'] = scope['client'][0]
+            environ['REMOTE_PORT'] = str(scope['client'][1])
+        for name, value in scope.get('headers', []):
+            name = name.decode('latin1').upper().replace('-', '_')
+            if name not in ('CONTENT_LENGTH', 'CONTENT_TYPE'):
+                name = f'HTTP_{name}'
+            value = value.decode('latin1')
+            if name in environ:
+                separator = '; ' if name == 'HTTP_COOKIE' else ','
+                value = f'{environ[name]}{separator}{value}'
+            environ[name] = value
+        return environ
+
+    def run_wsgi(self, scope, body, buffer):
+        send_message = buffer.put
+        start = {}
+
+        def start_response(status, headers, exc_info=None):
+            start.update({
+                'type': 'http.response.start',
+                'status': int(status.split(' ', 1)[0]),
+                'headers': [
+                    (name.lower().encode('latin1'), value.encode('latin1'))
+                    for name, value in headers
+                ],
+            })
+
+        environ = self.build_environ(scope, body)
+        response = self.wsgi_application(environ, start_response)
+        try:
+            started = False
+            for chunk in response:
+                if not started:
+                    send_message(start)
+                    started = True
+                if chunk:
+                    send_message({'type': 'http.response.body',
+                                  'body': chunk, 'more_body': True})
+            if not started:
+                send_message(start)
+            send_message({'type': 'http.response.body'})
+        finally:
+            if hasattr(response, 'close'):
+                response.close()
+            body.close()
+
+
+application = ThreadedWSGIApplication(
+    get_wsgi_application(),
+    pools=(
+        ('downloads', ('/api/recipes/download_shopping_cart/',),
+         settings.ASGI_DOWNLOAD_THREADS),
+    ),
+    threads=settings.ASGI_THREADS,
+    buffer_size=settings.ASGI_RESPONSE_BUFFER,
+)
@@ -1,7 +1,7 @@
 from django.contrib import admin
 
 from .models import (Ingredient, Recipe, RecipeIngredient, Tag,
-                     ShoppingCart, Favorite)
+                     ShoppingCart, ShoppingListItem, Favorite)
 
 
 class RecipeIngredientInline(admin.TabularInline):
@@ -20,6 +20,11 @@ class IngredientAdmin(admin.ModelAdmin):
     search_fields = ('name',)
     empty_value_display = '-пусто-'
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        ShoppingListItem.objects.rebuild(ShoppingCart.objects.filter(
+            recipe__ingredients=form.instance).values('user'))
+
 
 admin.site.register(Ingredient, IngredientAdmin)
 
@@ -48,13 +53,25 @@ class RecipeAdmin(admin.ModelAdmin):
     )
 
     def favorite_count_total(self, obj):
-        return Favorite.objects.filter(recipe=obj).count()
+        return obj.favorites_count
     favorite_count_total.short_description = 'Добавлений в избранное'
 
     search_fields = ('name', 'author')
     list_filter = ('name', 'author', 'tags')
     empty_value_display = '-пусто-'
 
+    def save_model(self, request, obj, form, change):
+        if 'image' in form.changed_data:
+            obj.renditions_ready = False
+            obj.renditions_attempts = 0
+        super().save_model(request, obj, form, change)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        Recipe.objects.filter(pk=form.instance.pk).update_search_vector()
+        ShoppingListItem.objects.rebuild(ShoppingCart.objects.filter(
+            recipe=form.instance).values('user'))
+
 
 admin.site.register(Recipe, RecipeAdmin)
 
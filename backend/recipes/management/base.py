@@ -0,0 +1,65 @@
+import csv
+import json
+import os
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+DATA_ROOT = os.path.join(settings.BASE_DIR, 'data')
+
+
+class BulkLoadCommand(BaseCommand):
+    model = None
+    fields = ()
+    default_filename = None
+    not_found_message = None
+
+    def add_arguments(self, parser):
+        parser.add_argument('filename', default=self.default_filename,
+                            nargs='?', type=str)
+        parser.add_argument('--batch-size', default=1000, type=int)
+
+    def read_rows(self, f, filename):
+        if filename.endswith('.json'):
+            for item in json.load(f):
+                yield tuple(item[field] for field in self.fields)
+        else:
+            yield from csv.reader(f)
+
+    def load(self, rows, batch_size):
+        total = 0
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                return total
+            self.model.objects.bulk_create(
+                (self.model(**dict(zip(self.fields, row))) for row in batch),
+                ignore_conflicts=True
+            )
+            total += len(batch)
+
+    def after_load(self):
+        pass
+
+    def handle(self, *args, **options):
+        filename = options['filename']
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше нуля')
+        count = self.model.objects.count()
+        start = time.monotonic()
+        try:
+            with open(os.path.join(DATA_ROOT, filename), 'r',
+                      encoding='utf-8') as f:
+                total = self.load(self.read_rows(f, filename),
+                                  options['batch_size'])
+        except FileNotFoundError:
+            raise CommandError(self.not_found_message)
+        elapsed = time.monotonic() - start
+        self.after_load()
+        created = self.model.objects.count() - count
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано строк: {total}, добавлено: {created}, '
+            f'{total / elapsed if elapsed else total:.0f} строк/с'
+        ))
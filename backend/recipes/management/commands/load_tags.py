@@ -1,30 +1,13 @@
-import csv
-import os
-
-from django.conf import settings
-from django.core.management.base import BaseCommand, CommandError
-
+from api.cache import bump_version
+from recipes.management.base import BulkLoadCommand
 from recipes.models import Tag
 
-DATA_ROOT = os.path.join(settings.BASE_DIR, 'data')
-
-
-class Command(BaseCommand):
 
-    def add_arguments(self, parser):
-        parser.add_argument('filename', default='tags.csv', nargs='?',
-                            type=str)
+class Command(BulkLoadCommand):
+    model = Tag
+    fields = ('name', 'color', 'slug')
+    default_filename = 'tags.csv'
+    not_found_message = 'Добавьте файл tags.csv в директорию data'
 
-    def handle(self, *args, **options):
-        try:
-            with open(os.path.join(DATA_ROOT, options['filename']), 'r',
-                      encoding='utf-8') as f:
-                datareader = csv.reader(f)
-                for row in datareader:
-                    Tag.objects.get_or_create(
-                        name=row[0],
-                        color=row[1],
-                        slug=row[2]
-                    )
-        except FileNotFoundError:
-            raise CommandError('Добавьте файл tags.csv в директорию data')
+    def after_load(self):
+        bump_version('tags')
@@ -0,0 +1,65 @@
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import F
+
+from recipes.models import Recipe
+from recipes.renditions import make_renditions
+
+
+class Command(BaseCommand):
+    help = ('Создаёт уменьшенные копии изображений рецептов '
+            'в форматах WebP и JPEG.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', default=2, type=int)
+        parser.add_argument('--batch-size', default=50, type=int)
+        parser.add_argument('--max-attempts', default=3, type=int)
+        parser.add_argument('--loop', action='store_true',
+                            help='Работать постоянно, проверяя новые рецепты')
+        parser.add_argument('--interval', default=5, type=int)
+
+    def process_batch(self, executor, batch_size, max_attempts):
+        pending = dict(
+            Recipe.objects.filter(
+                renditions_ready=False, renditions_attempts__lt=max_attempts
+            ).exclude(image__isnull=True).exclude(image='').order_by(
+                'renditions_attempts', 'pk').values_list(
+                'image', 'pk')[:batch_size]
+        )
+        if not pending:
+            return 0
+        connections.close_all()
+        futures = {
+            executor.submit(make_renditions, image_name): image_name
+            for image_name in pending
+        }
+        done = []
+        failed = []
+        for future in as_completed(futures):
+            image_name = futures[future]
+            try:
+                future.result()
+            except Exception as error:
+                self.stderr.write(f'{image_name}: {error}')
+                failed.append(image_name)
+                continue
+            done.append(image_name)
+        Recipe.objects.filter(image__in=done).update(renditions_ready=True)
+        Recipe.objects.filter(image__in=failed).update(
+            renditions_attempts=F('renditions_attempts') + 1)
+        self.stdout.write(f'Обработано изображений: {len(done)}, '
+                          f'с ошибкой: {len(failed)}')
+        return len(pending)
+
+    def handle(self, *args, **options):
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            while True:
+                if self.process_batch(executor, options['batch_size'],
+                                      options['max_attempts']):
+                    continue
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favorite, Recipe
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счётчики favorites_count у рецептов '
+            'и recipes_count у пользователей.')
+
+    @staticmethod
+    def repair(queryset, field, related_queryset, related_field):
+        actual = Coalesce(Subquery(
+            related_queryset.filter(
+                **{related_field: OuterRef('pk')}
+            ).order_by().values(related_field).annotate(
+                count=Count('pk')
+            ).values('count')
+        ), 0)
+        drifted = queryset.annotate(actual=actual).exclude(
+            **{field: F('actual')}
+        ).values_list('pk', flat=True)
+        return queryset.filter(pk__in=list(drifted)).update(
+            **{field: actual})
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            recipes = self.repair(Recipe.objects.all(), 'favorites_count',
+                                  Favorite.objects.all(), 'recipe')
+            users = self.repair(User.objects.all(), 'recipes_count',
+                                Recipe.objects.all(), 'author')
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено рецептов: {recipes}, пользователей: {users}'))
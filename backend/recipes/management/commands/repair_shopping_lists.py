@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.models import ShoppingListItem
+
+
+class Command(BaseCommand):
+    help = ('Пересобирает агрегированные списки покупок всех '
+            'пользователей из их корзин.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            total = ShoppingListItem.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Позиций в списках покупок: {total}'))
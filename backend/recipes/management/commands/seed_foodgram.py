@@ -0,0 +1,213 @@
+import csv
+import io
+import random
+import time
+from itertools import accumulate, islice
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from api.cache import bump_version
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag, TimelineEntry)
+from users.models import Subscription, User
+
+
+def zipf_cum_weights(size, alpha):
+    return list(accumulate(1 / rank ** alpha for rank in range(1, size + 1)))
+
+
+def distribute(total, size, alpha, cap):
+    cum_weights = zipf_cum_weights(size, alpha)
+    weights = [cum_weights[0]] + [
+        right - left for left, right in zip(cum_weights, cum_weights[1:])]
+    counts = [min(cap, int(total * weight / cum_weights[-1]))
+              for weight in weights]
+    left = total - sum(counts)
+    for rank in range(size):
+        if left <= 0:
+            break
+        extra = min(cap - counts[rank], left)
+        counts[rank] += extra
+        left -= extra
+    return counts
+
+
+def pick(rng, population, cum_weights, count):
+    chosen = dict.fromkeys(
+        rng.choices(population, cum_weights=cum_weights, k=count * 2))
+    chosen = list(islice(chosen, count))
+    if len(chosen) < count:
+        seen = set(chosen)
+        while len(chosen) < count:
+            item = rng.choice(population)
+            if item not in seen:
+                seen.add(item)
+                chosen.append(item)
+    return chosen
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими пользователями, рецептами, '
+            'избранным, корзинами и подписками со степенным '
+            'распределением популярности.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', default=1000, type=int)
+        parser.add_argument('--recipes', default=10000, type=int)
+        parser.add_argument('--ingredients-per-recipe', default=8, type=int)
+        parser.add_argument('--favorites', default=50000, type=int)
+        parser.add_argument('--carts', default=10000, type=int)
+        parser.add_argument('--subscriptions', default=20000, type=int)
+        parser.add_argument('--alpha', default=1.2, type=float)
+        parser.add_argument('--batch-size', default=5000, type=int)
+        parser.add_argument('--seed', default=1, type=int)
+
+    def copy(self, model, fields, batch):
+        meta = model._meta
+        columns = ', '.join(
+            connection.ops.quote_name(meta.get_field(field).column)
+            for field in fields)
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(batch)
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.cursor.copy_expert(
+                f'COPY {connection.ops.quote_name(meta.db_table)} '
+                f'({columns}) FROM STDIN WITH (FORMAT csv)', buffer)
+
+    def insert(self, model, fields, batch):
+        model.objects.bulk_create(
+            model(**dict(zip(fields, row))) for row in batch)
+
+    def load(self, label, model, fields, rows, total, batch_size):
+        write = self.copy if connection.vendor == 'postgresql' else (
+            self.insert)
+        done = 0
+        start = time.monotonic()
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            write(model, fields, batch)
+            done += len(batch)
+            elapsed = time.monotonic() - start
+            self.stdout.write(
+                f'{label}: {done}/{total or "?"}, '
+                f'{done / elapsed if elapsed else done:.0f} строк/с',
+                ending='\r')
+            self.stdout.flush()
+        elapsed = time.monotonic() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'{label}: {done}, '
+            f'{done / elapsed if elapsed else done:.0f} строк/с'))
+
+    @staticmethod
+    def relations(rng, owners, counts, population, cum_weights,
+                  exclude_owner):
+        for owner, count in zip(owners, counts):
+            targets = pick(rng, population, cum_weights,
+                           count + exclude_owner)
+            if exclude_owner:
+                targets = [target for target in targets if target != owner]
+            for target in targets[:count]:
+                yield owner, target
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше нуля')
+        if options['users'] < 2 or options['recipes'] < 1:
+            raise CommandError('Нужно минимум 2 пользователя и 1 рецепт')
+        ingredients = list(Ingredient.objects.values_list('id', flat=True))
+        tags = list(Tag.objects.values_list('id', flat=True))
+        if not ingredients or not tags:
+            raise CommandError('Сначала загрузите ингредиенты и теги '
+                               '(load_ingredients, load_tags)')
+        rng = random.Random(options['seed'])
+        alpha = options['alpha']
+        batch_size = options['batch_size']
+        now = timezone.now()
+        first_user = (User.objects.aggregate(id=Max('id'))['id'] or 0) + 1
+        first_recipe = (Recipe.objects.aggregate(id=Max('id'))['id']
+                        or 0) + 1
+        users = list(range(first_user, first_user + options['users']))
+        recipes = list(range(first_recipe,
+                             first_recipe + options['recipes']))
+        authors = users[:]
+        rng.shuffle(authors)
+        popular_recipes = recipes[:]
+        rng.shuffle(popular_recipes)
+        popular_ingredients = ingredients[:]
+        rng.shuffle(popular_ingredients)
+        author_weights = zipf_cum_weights(len(authors), alpha)
+        recipe_weights = zipf_cum_weights(len(recipes), alpha)
+        ingredient_weights = zipf_cum_weights(len(ingredients), alpha)
+        per_recipe = min(options['ingredients_per_recipe'], len(ingredients))
+        start = time.monotonic()
+        with transaction.atomic():
+            self.load(
+                'Пользователи', User,
+                ('id', 'username', 'email', 'first_name', 'last_name',
+                 'password', 'is_superuser', 'is_staff', 'is_active',
+                 'date_joined', 'recipes_count'),
+                ((pk, f'seed_user_{pk}', f'seed_user_{pk}@seed.ru', 'Seed',
+                  f'User {pk}', f'!seed_{pk}', False, False, True, now, 0)
+                 for pk in users),
+                len(users), batch_size)
+            self.load(
+                'Рецепты', Recipe,
+                ('id', 'author_id', 'name', 'text', 'cooking_time',
+                 'creation_date', 'renditions_ready', 'renditions_attempts',
+                 'favorites_count'),
+                ((pk, author, f'Рецепт {pk}', f'Описание рецепта {pk}',
+                  rng.randint(1, 180), now, False, 0, 0)
+                 for pk, author in zip(recipes, rng.choices(
+                     authors, cum_weights=author_weights, k=len(recipes)))),
+                len(recipes), batch_size)
+            self.load(
+                'Теги рецептов', Recipe.tags.through, ('recipe_id', 'tag_id'),
+                ((pk, tag) for pk in recipes
+                 for tag in rng.sample(tags, rng.randint(1, len(tags)))),
+                None, batch_size)
+            self.load(
+                'Ингредиенты рецептов', RecipeIngredient,
+                ('recipe_id', 'ingredient_id', 'amount'),
+                ((pk, ingredient, rng.randint(1, 1000)) for pk in recipes
+                 for ingredient in pick(rng, popular_ingredients,
+                                        ingredient_weights, per_recipe)),
+                len(recipes) * per_recipe, batch_size)
+            for (label, model, field, total, population, weights, cap,
+                 exclude_owner) in (
+                    ('Избранное', Favorite, 'recipe_id',
+                     options['favorites'], popular_recipes, recipe_weights,
+                     len(recipes) // 2, False),
+                    ('Корзины', ShoppingCart, 'recipe_id', options['carts'],
+                     popular_recipes, recipe_weights, len(recipes) // 2,
+                     False),
+                    ('Подписки', Subscription, 'author_id',
+                     options['subscriptions'], authors, author_weights,
+                     (len(users) - 1) // 2, True)):
+                active = users[:]
+                rng.shuffle(active)
+                counts = distribute(total, len(active), alpha, cap)
+                self.load(
+                    label, model, ('user_id', field),
+                    self.relations(rng, active, counts, population, weights,
+                                   exclude_owner),
+                    sum(counts), batch_size)
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(
+                        no_style(), [User, Recipe]):
+                    cursor.execute(sql)
+            call_command('repair_counters', stdout=self.stdout)
+            call_command('repair_shopping_lists', stdout=self.stdout)
+            TimelineEntry.objects.rebuild()
+            Recipe.objects.filter(
+                id__gte=first_recipe).update_search_vector()
+        bump_version('recipes')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.monotonic() - start:.1f} с'))
@@ -0,0 +1,60 @@
+# Generated by Django 2.2.19 on 2026-10-18 05:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_timelines(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    TimelineEntry = apps.get_model('recipes', 'TimelineEntry')
+    recipes = Recipe.objects.filter(
+        author__subscribing__isnull=False
+    ).values_list(
+        'author__subscribing__user', 'pk', 'author', 'creation_date'
+    ).order_by()
+    batch_size = max(1, schema_editor.connection.ops.bulk_batch_size(
+        TimelineEntry._meta.concrete_fields, range(1000)))
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user, recipe_id=recipe, author_id=author,
+                       creation_date=creation_date)
+         for user, recipe, author, creation_date in recipes.iterator()),
+        batch_size=batch_size)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0008_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('creation_date', models.DateTimeField(verbose_name='Время создания рецепта')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='recipes.Recipe', verbose_name='Рецепт')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Ленты подписок',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', '-creation_date', '-recipe'], name='timeline_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', 'author'], name='timeline_user_author_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='timelineentry',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='Уникальный рецепт в ленте'),
+        ),
+        migrations.RunPython(fill_timelines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.19 on 2026-10-18 05:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_timelineentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='renditions_attempts',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+    ]
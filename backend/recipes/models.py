@@ -1,7 +1,18 @@
+from collections import defaultdict
+
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector, SearchVectorField)
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import connections, models, transaction
+from django.db.models import (BooleanField, Case, Exists, F, FloatField,
+                              OuterRef, Prefetch, Q, Subquery, Sum,
+                              TextField, Value, When)
+from django.db.models.functions import Greatest
+
+from users.models import Subscription, User
 
-from users.models import User
+SEARCH_CONFIG = 'russian'
+TIMELINE_BATCH_SIZE = 1000
 
 
 class Ingredient(models.Model):
@@ -17,6 +28,12 @@ class Ingredient(models.Model):
     class Meta:
         verbose_name = "Ингредиент"
         verbose_name_plural = "Ингредиенты"
+        constraints = (
+            models.UniqueConstraint(
+                fields=('name', 'measurement_unit'),
+                name='Уникальный ингредиент',
+            ),
+        )
 
     def __str__(self):
         return self.name
@@ -49,6 +66,91 @@ class Tag(models.Model):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+
+    def with_user_flags(self, user, fields=None):
+        flags = {
+            'is_favorited': Favorite,
+            'is_in_shopping_cart': ShoppingCart,
+        }
+        if fields is not None:
+            flags = {flag: model for flag, model in flags.items()
+                     if flag in fields}
+        if user.is_anonymous:
+            return self.annotate(**{
+                flag: Value(False, output_field=BooleanField())
+                for flag in flags
+            })
+        return self.annotate(**{
+            flag: Exists(model.objects.filter(
+                user=user, recipe=OuterRef('pk')))
+            for flag, model in flags.items()
+        })
+
+    def with_related(self, user, fields=None):
+        deferred = ['search_vector']
+        if fields is not None and 'text' not in fields:
+            deferred.append('text')
+        lookups = []
+        if fields is None or 'tags' in fields:
+            lookups.append('tags')
+        if fields is None or 'author' in fields:
+            authors = User.objects.all()
+            if not user.is_anonymous:
+                authors = authors.annotate(is_subscribed=Exists(
+                    Subscription.objects.filter(
+                        user=user, author=OuterRef('pk'))))
+            lookups.append(Prefetch('author', queryset=authors))
+        if fields is None or 'ingredients' in fields:
+            lookups.append(Prefetch(
+                'recipeingredient',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient')))
+        return self.defer(*deferred).prefetch_related(*lookups)
+
+    def search(self, query):
+        if connections[self.db].vendor == 'postgresql':
+            search_query = SearchQuery(query, config=SEARCH_CONFIG)
+            return self.filter(search_vector=search_query).annotate(
+                rank=SearchRank(F('search_vector'), search_query)
+            ).order_by('-rank', '-creation_date')
+        return self.annotate(
+            ingredient_match=Exists(RecipeIngredient.objects.filter(
+                recipe=OuterRef('pk'), ingredient__name__icontains=query))
+        ).filter(
+            Q(name__icontains=query)
+            | Q(text__icontains=query)
+            | Q(ingredient_match=True)
+        ).annotate(
+            rank=sum(
+                Case(When(condition, then=Value(weight)), default=Value(0.0),
+                     output_field=FloatField())
+                for condition, weight in (
+                    (Q(name__icontains=query), 1.0),
+                    (Q(ingredient_match=True), 0.4),
+                    (Q(text__icontains=query), 0.2),
+                )
+            )
+        ).order_by('-rank', '-creation_date')
+
+    def update_search_vector(self):
+        if connections[self.db].vendor != 'postgresql':
+            return
+        from django.contrib.postgres.aggregates import StringAgg
+        ingredient_names = RecipeIngredient.objects.filter(
+            recipe=OuterRef('pk')
+        ).values('recipe').annotate(
+            names=StringAgg('ingredient__name', ' ')
+        ).values('names')
+        self.update(search_vector=(
+            SearchVector('name', weight='A', config=SEARCH_CONFIG)
+            + SearchVector(Subquery(ingredient_names,
+                                    output_field=TextField()),
+                           weight='B', config=SEARCH_CONFIG)
+            + SearchVector('text', weight='C', config=SEARCH_CONFIG)
+        ))
+
+
 class Recipe(models.Model):
     author = models.ForeignKey(
         User,
@@ -72,6 +174,14 @@ class Recipe(models.Model):
         null=True,
         default=None
     )
+    renditions_ready = models.BooleanField(
+        default=False,
+        editable=False,
+    )
+    renditions_attempts = models.PositiveSmallIntegerField(
+        default=0,
+        editable=False,
+    )
     name = models.CharField(
         max_length=200,
         verbose_name='Название',
@@ -87,9 +197,24 @@ class Recipe(models.Model):
         db_index=True,
         verbose_name='Время создания'
     )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Добавлений в избранное'
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
-        ordering = ('-creation_date',)
+        ordering = ('-creation_date', '-id')
+        indexes = (
+            models.Index(fields=('-creation_date', '-id'),
+                         name='recipe_feed_idx'),
+        )
         verbose_name = "Рецепт"
         verbose_name_plural = "Рецепты"
 
@@ -180,3 +305,179 @@ class Favorite(models.Model):
                 name='Уникальный рецепт в избранном',
             ),
         ]
+
+
+class ShoppingListItemQuerySet(models.QuerySet):
+
+    def add_amounts(self, users, amounts):
+        amounts = {
+            ingredient: amount for ingredient, amount in amounts.items()
+            if amount
+        }
+        users = sorted(set(users))
+        if not amounts or not users:
+            return
+        deltas = defaultdict(list)
+        for ingredient, amount in sorted(amounts.items()):
+            deltas[amount].append(ingredient)
+        items = self.filter(user__in=users, ingredient__in=amounts)
+        with transaction.atomic(using=self.db):
+            # Недостающие строки создаются пустыми: параллельная вставка
+            # той же пары ждёт коммита и пропускается, а блокировки берутся
+            # в одном порядке, чтобы изменения корзин не взаимоблокировались.
+            self.bulk_create(
+                (self.model(user_id=user, ingredient_id=ingredient, amount=0)
+                 for user in users
+                 for ingredient, amount in sorted(amounts.items())
+                 if amount > 0),
+                ignore_conflicts=True)
+            list(items.select_for_update().order_by(
+                'user', 'ingredient').values_list('pk', flat=True))
+            for amount, ingredients in deltas.items():
+                items.filter(ingredient__in=ingredients).update(
+                    amount=Greatest(F('amount') + amount, 0))
+            items.filter(amount=0).delete()
+
+    def add_recipe(self, user, recipe, sign=1):
+        self.add_amounts([user], {
+            ingredient: sign * (amount or 0)
+            for ingredient, amount in RecipeIngredient.objects.filter(
+                recipe=recipe).values_list('ingredient', 'amount')
+        })
+
+    def rebuild(self, users=None):
+        items = self.all()
+        carts = ShoppingCart.objects.all()
+        if users is not None:
+            items = items.filter(user__in=users)
+            carts = carts.filter(user__in=users)
+        items.delete()
+        totals = RecipeIngredient.objects.filter(
+            recipe__shoppingcarts__in=carts
+        ).values_list(
+            'recipe__shoppingcarts__user', 'ingredient'
+        ).annotate(total=Sum('amount')).filter(total__gt=0).order_by()
+        return len(self.bulk_create(
+            self.model(user_id=user, ingredient_id=ingredient, amount=total)
+            for user, ingredient, total in totals.iterator()
+        ))
+
+
+class ShoppingListItem(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Ингредиент',
+    )
+    amount = models.PositiveIntegerField(
+        verbose_name='Количество',
+    )
+
+    objects = ShoppingListItemQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Позиция списка покупок"
+        verbose_name_plural = "Список покупок"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='Уникальный ингредиент в списке покупок',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user} {self.ingredient}'
+
+
+class TimelineEntryQuerySet(models.QuerySet):
+
+    def batch_size(self):
+        return max(1, connections[self.db].ops.bulk_batch_size(
+            self.model._meta.concrete_fields, range(TIMELINE_BATCH_SIZE)))
+
+    def fan_out(self, recipe):
+        followers = Subscription.objects.filter(
+            author=recipe.author_id).values_list('user', flat=True)
+        self.bulk_create(
+            (self.model(user_id=user, recipe_id=recipe.pk,
+                        author_id=recipe.author_id,
+                        creation_date=recipe.creation_date)
+             for user in followers.iterator()),
+            batch_size=self.batch_size(), ignore_conflicts=True)
+
+    def backfill(self, user, author):
+        recipes = Recipe.objects.filter(author=author).values_list(
+            'pk', 'creation_date')
+        self.bulk_create(
+            (self.model(user_id=user, recipe_id=recipe,
+                        author_id=author, creation_date=creation_date)
+             for recipe, creation_date in recipes.iterator()),
+            batch_size=self.batch_size(), ignore_conflicts=True)
+
+    def trim(self, user, author):
+        self.filter(user=user, author=author).delete()
+
+    def rebuild(self):
+        self.all().delete()
+        recipes = Recipe.objects.filter(
+            author__subscribing__isnull=False
+        ).values_list(
+            'author__subscribing__user', 'pk', 'author', 'creation_date'
+        ).order_by()
+        return len(self.bulk_create(
+            (self.model(user_id=user, recipe_id=recipe, author_id=author,
+                        creation_date=creation_date)
+             for user, recipe, author, creation_date in recipes.iterator()),
+            batch_size=self.batch_size()))
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Пользователь',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Рецепт',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор',
+    )
+    creation_date = models.DateTimeField(
+        verbose_name='Время создания рецепта',
+    )
+
+    objects = TimelineEntryQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Запись ленты"
+        verbose_name_plural = "Ленты подписок"
+        indexes = (
+            models.Index(fields=('user', '-creation_date', '-recipe'),
+                         name='timeline_user_date_idx'),
+            models.Index(fields=('user', 'author'),
+                         name='timeline_user_author_idx'),
+        )
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='Уникальный рецепт в ленте',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user} {self.recipe}'
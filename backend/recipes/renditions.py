@@ -0,0 +1,49 @@
+import io
+import os
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image
+
+RENDITION_WIDTHS = (320, 640, 1280)
+RENDITION_FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+RENDITION_QUALITY = 80
+RENDITIONS_DIR = 'recipes/renditions/'
+
+
+def rendition_name(image_name, width, extension):
+    name = os.path.splitext(os.path.basename(image_name))[0]
+    return f'{RENDITIONS_DIR}{name}_{width}.{extension}'
+
+
+def rendition_names(image_name):
+    return {
+        width: {
+            extension: rendition_name(image_name, width, extension)
+            for extension in RENDITION_FORMATS
+        }
+        for width in RENDITION_WIDTHS
+    }
+
+
+def make_renditions(image_name):
+    with default_storage.open(image_name) as f:
+        image = Image.open(f)
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+    for width in RENDITION_WIDTHS:
+        resized = image.copy()
+        resized.thumbnail((width, width * 4), Image.LANCZOS)
+        for extension, image_format in RENDITION_FORMATS.items():
+            frame = resized
+            if image_format == 'JPEG' and frame.mode == 'RGBA':
+                frame = Image.new('RGB', resized.size, (255, 255, 255))
+                frame.paste(resized, mask=resized.split()[-1])
+            buffer = io.BytesIO()
+            frame.save(buffer, image_format, quality=RENDITION_QUALITY)
+            name = rendition_name(image_name, width, extension)
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            default_storage.save(name, ContentFile(buffer.getvalue()))
+    return image_name
@@ -0,0 +1,33 @@
+# Generated by Django 2.2.19 on 2026-10-18 04:54
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_recipes_count(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    User = apps.get_model('users', 'User')
+    recipes = Recipe.objects.filter(
+        author=OuterRef('pk')
+    ).order_by().values('author').annotate(
+        count=Count('pk')
+    ).values('count')
+    User.objects.update(recipes_count=Coalesce(Subquery(recipes), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('recipes', '0002_auto_20230505_2229'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Recipes_count'),
+        ),
+        migrations.RunPython(fill_recipes_count, migrations.RunPython.noop),
+    ]
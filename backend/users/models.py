@@ -33,6 +33,11 @@ class User(AbstractUser):
         blank=False,
         verbose_name='Last_name'
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Recipes_count'
+    )
 
     class Meta:
         ordering = ['id']